@@ -0,0 +1,111 @@
+# commute_matrix.py
+"""
+Precomputed commute-time matrix for one school's catchment area.
+ - catchment_origins() lays a grid over the catchment and snaps every point to its nearest walk node
+ - build_matrix() fills origins x arrival-time slots with ONE backward one-to-many search per slot
+   (MultimodalGraph.latest_departures), instead of one routing run per user
+ - the result is a uint16 .npy (tenths of a minute rounded up, memory-mapped on load) + a small .json sidecar
+ - CommuteMatrix.travel_min() is then an O(1) array read: the latest departure of the slot at or before
+   arrive_by, which is never later than the true one (latest departure is a step function of arrive_by,
+   so interpolating between slots could promise a bus that arrives too late)
+Slots are "arrive by" times because alarms are anchored at the school start time.
+"""
+
+import datetime
+import json
+import math
+from typing import Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from alarm import calculate_alarm_time
+from multimodal import MultimodalBuilder, MultimodalGraph
+
+MISSING = np.iinfo(np.uint16).max   # unreachable within max_travel_min
+SCALE = 10.0                        # stored unit: 0.1 minute
+
+
+def catchment_origins(builder: MultimodalBuilder, lat: float, lon: float, radius_m: float,
+                      spacing_m: float = 250.0, snap_m: float = 200.0) -> List[Hashable]:
+    """Grid points every spacing_m within radius_m of the school, snapped to walk nodes (duplicates dropped)."""
+    dlat = spacing_m / 111000.0
+    dlon = spacing_m / (111000.0 * math.cos(math.radians(lat)))
+    steps = int(radius_m // spacing_m)
+    origins, seen = [], set()
+    for i in range(-steps, steps + 1):
+        for j in range(-steps, steps + 1):
+            if (i * i + j * j) * spacing_m ** 2 > radius_m ** 2:
+                continue
+            near = builder.nearest_walk_nodes(lat + i * dlat, lon + j * dlon, k=1, radius_m=snap_m)
+            if near and near[0][1] not in seen:
+                seen.add(near[0][1])
+                origins.append(builder.ids[near[0][1]])
+    return origins
+
+
+def build_matrix(graph: MultimodalGraph, school: Hashable, origins: Sequence[Hashable],
+                 slots: Sequence[float], max_travel_min: float = 120.0) -> np.ndarray:
+    """
+    slots: arrive-by minutes since midnight, ascending (e.g. range(7*60, 9*60+1, 5))
+    Returns uint16 array [len(origins), len(slots)] of travel minutes * SCALE (MISSING if unreachable).
+    """
+    rows = np.array([graph.index[o] for o in origins])
+    matrix = np.full((len(origins), len(slots)), MISSING, dtype=np.uint16)
+    for s, arrive_by in enumerate(slots):
+        latest = graph.latest_departures(school, arrive_by, max_travel_min)
+        for r, node in enumerate(rows):
+            dep = latest.get(int(node))
+            if dep is not None:
+                # round up on the raw value: the stored time may be a tick long, never short
+                matrix[r, s] = min(MISSING - 1, math.ceil((arrive_by - dep) * SCALE))
+    return matrix
+
+
+def save_matrix(path: str, matrix: np.ndarray, school: Hashable, origins: Sequence[Hashable],
+                slots: Sequence[float]):
+    """Write path + '.npy' (the matrix) and path + '.json' (school, origin ids, slots)."""
+    np.save(path + ".npy", matrix)
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump({"school": school, "origins": list(origins), "slots": list(slots),
+                   "scale": SCALE, "built": datetime.datetime.now().isoformat(timespec="seconds")},
+                  f, ensure_ascii=False)
+
+
+class CommuteMatrix:
+    def __init__(self, path: str):
+        """Open a matrix written by save_matrix; the array is memory-mapped, not read into RAM."""
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.school = meta["school"]
+        self.slots = np.asarray(meta["slots"], dtype=float)
+        self.scale = meta.get("scale", SCALE)
+        self.row = {o: i for i, o in enumerate(meta["origins"])}
+        self.data = np.load(path + ".npy", mmap_mode="r")
+
+    def travel_min(self, origin: Hashable, arrive_by: float) -> Optional[float]:
+        """
+        Minutes before arrive_by (minutes since midnight) to leave origin; None if unknown.
+        Uses the slot at or before arrive_by: leaving at that slot's latest departure is guaranteed to
+        arrive by arrive_by too, so the answer is never shorter than the true travel time.
+        arrive_by outside [slots[0], slots[-1]] is None: past the last slot the waiting time would grow unbounded.
+        """
+        r = self.row.get(origin)
+        if r is None:
+            return None
+        if arrive_by > self.slots[-1]:
+            return None
+        j = int(np.searchsorted(self.slots, arrive_by, side="right")) - 1
+        if j < 0:
+            return None
+        v = self.data[r, j]
+        if v == MISSING:
+            return None
+        latest_dep = self.slots[j] - v / self.scale
+        return float(arrive_by - latest_dep)
+
+    def alarm_time(self, origin: Hashable, prep_time, school_hour=9, school_minute=0) -> Optional[str]:
+        """Same as alarm.calculate_alarm_time, with the commute time read from the matrix."""
+        travel = self.travel_min(origin, school_hour * 60 + school_minute)
+        if travel is None:
+            return None
+        return calculate_alarm_time(prep_time, math.ceil(travel), school_hour, school_minute)
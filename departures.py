@@ -0,0 +1,137 @@
+# departures.py
+"""
+Incremental departures index for a stop-board view.
+ - One min-heap per stop, keyed by departure time (epoch seconds); entries carry a version so
+   updates/removals are O(log n) pushes and old entries are skipped lazily
+ - "next k departures at stops S within T minutes" walks the heaps' implicit trees with a small
+   frontier heap, so it costs O(|S| + k log k) and never re-sorts a stop
+Run `python departures.py` for a benchmark (thousands of stops, per-second updates).
+"""
+
+import heapq
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# heap entry: (depart_ts, dep_id, version, desc)
+Entry = Tuple[float, str, int, str]
+
+
+class DeparturesIndex:
+    def __init__(self):
+        self.heaps: Dict[str, List[Entry]] = {}
+        self.live: Dict[str, Tuple[str, int]] = {}   # dep_id -> (stop_id, version)
+        self._stale: Dict[str, int] = {}             # stop_id -> stale entries still in its heap
+        self._version = 0
+
+    def __len__(self):
+        return len(self.live)
+
+    def _is_live(self, entry: Entry) -> bool:
+        cur = self.live.get(entry[1])
+        return cur is not None and cur[1] == entry[2]
+
+    def _mark_stale(self, stop_id: str):
+        self._stale[stop_id] = self._stale.get(stop_id, 0) + 1
+        h = self.heaps[stop_id]
+        # rebuild once stale entries outnumber live ones, so each heap stays O(live)
+        if self._stale[stop_id] * 2 > len(h):
+            self.heaps[stop_id] = [e for e in h if self._is_live(e)]
+            heapq.heapify(self.heaps[stop_id])
+            self._stale[stop_id] = 0
+
+    def upsert(self, stop_id: str, dep_id: str, depart_ts: float, desc: str = ""):
+        """Insert a departure or move an existing one (new time and/or stop)."""
+        old = self.live.get(dep_id)
+        self._version += 1
+        self.live[dep_id] = (stop_id, self._version)
+        if old is not None:
+            self._mark_stale(old[0])
+        heapq.heappush(self.heaps.setdefault(stop_id, []), (depart_ts, dep_id, self._version, desc))
+
+    def remove(self, dep_id: str) -> bool:
+        old = self.live.pop(dep_id, None)
+        if old is None:
+            return False
+        self._mark_stale(old[0])
+        return True
+
+    def _trim(self, stop_id: str, now_ts: float):
+        """Pop stale and already departed entries off the top of one stop's heap."""
+        h = self.heaps.get(stop_id)
+        while h and (not self._is_live(h[0]) or h[0][0] < now_ts):
+            entry = heapq.heappop(h)
+            if self._is_live(entry):
+                del self.live[entry[1]]
+            else:
+                self._stale[stop_id] -= 1
+
+    def expire(self, now_ts: float, stops: Optional[Iterable[str]] = None):
+        """Drop departures earlier than now_ts (all stops, or only the given ones)."""
+        for stop_id in (self.heaps if stops is None else stops):
+            self._trim(stop_id, now_ts)
+
+    def next_departures(self, stops: Iterable[str], k: int, within_min: float,
+                        now_ts: Optional[float] = None) -> List[Tuple[float, str, str, str]]:
+        """
+        Return up to k soonest departures at the given stops leaving in [now, now + within_min].
+        Result rows: (depart_ts, stop_id, dep_id, desc)
+        """
+        now_ts = time.time() if now_ts is None else now_ts
+        limit = now_ts + within_min * 60
+        frontier = []
+        for stop_id in stops:
+            self._trim(stop_id, now_ts)
+            h = self.heaps.get(stop_id)
+            if h and h[0][0] <= limit:
+                frontier.append((h[0][0], stop_id, 0))
+        heapq.heapify(frontier)
+
+        out = []
+        while frontier and len(out) < k:
+            ts, stop_id, i = heapq.heappop(frontier)
+            h = self.heaps[stop_id]
+            entry = h[i]
+            if self._is_live(entry):
+                out.append((ts, stop_id, entry[1], entry[3]))
+            # children of a heap node are never earlier than the node itself
+            for c in (2 * i + 1, 2 * i + 2):
+                if c < len(h) and h[c][0] <= limit:
+                    heapq.heappush(frontier, (h[c][0], stop_id, c))
+        return out
+
+
+def benchmark(n_stops: int = 5000, deps_per_stop: int = 20, seconds: int = 60,
+              updates_per_sec: int = 2000, queries_per_sec: int = 200, seed: int = 0):
+    """Simulate a live feed: per-second arrival updates + stop-board queries over random stop sets."""
+    rnd = random.Random(seed)
+    idx = DeparturesIndex()
+    t0 = 1_700_000_000.0
+    stops = [f"S{i}" for i in range(n_stops)]
+    for s in stops:
+        for j in range(deps_per_stop):
+            idx.upsert(s, f"{s}-{j}", t0 + rnd.uniform(0, 3600), f"Bus {rnd.randint(1, 999)} at {s}")
+
+    upd_time = query_time = 0.0
+    for sec in range(seconds):
+        now = t0 + sec
+        t = time.perf_counter()
+        for _ in range(updates_per_sec):
+            s = rnd.choice(stops)
+            idx.upsert(s, f"{s}-{rnd.randrange(deps_per_stop * 2)}", now + rnd.uniform(0, 3600), "update")
+        upd_time += time.perf_counter() - t
+        t = time.perf_counter()
+        for _ in range(queries_per_sec):
+            idx.next_departures(rnd.sample(stops, 10), k=5, within_min=30, now_ts=now)
+        query_time += time.perf_counter() - t
+        idx.expire(now)
+
+    n_upd = seconds * updates_per_sec
+    n_q = seconds * queries_per_sec
+    print(f"stops={n_stops} live={len(idx)} simulated={seconds}s")
+    print(f"upsert: {upd_time / n_upd * 1e6:.2f} us/op ({n_upd} ops)")
+    print(f"query (10 stops, k=5, 30 min): {query_time / n_q * 1e6:.2f} us/op ({n_q} ops)")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -52,8 +52,11 @@ class Edge:
         self.delay_fn = delay_fn
         self.meta = meta or {}
 
-    def effective_time(self, current_time: datetime.datetime, elapsed_min:int) -> int:
-        """Return base + realtime delay (in minutes)."""
+    def effective_time(self, current_time: datetime.datetime, elapsed_min:int) -> float:
+        """
+        Return base + realtime delay (in minutes).
+        Integer base times are rounded to whole minutes; float base times (e.g. from OSM lengths) stay fractional.
+        """
         delay = 0
         if self.delay_fn:
             try:
@@ -63,11 +66,14 @@ class Edge:
             except Exception as e:
                 # fail-safe: no extra delay
                 delay = 0
-        return int(self.base_min + delay)
+        total = self.base_min + delay
+        return int(total) if isinstance(self.base_min, int) else float(total)
 
 class Graph:
     def __init__(self):
         self.adj: Dict[str, List[Edge]] = {}
+        # goal -> backward base-time tree (see _backward_tree); cleared whenever an edge is added
+        self.backward_trees: Dict[str, Tuple[Dict[str, float], Dict[str, int]]] = {}
 
     def add_node(self, node_id: str):
         if node_id not in self.adj:
@@ -79,6 +85,7 @@ class Graph:
         self.add_node(from_node)
         self.add_node(to_node)
         self.adj[from_node].append(Edge(to_node, base_min, delay_fn, meta))
+        self.backward_trees.clear()
 
     def neighbors(self, node_id: str) -> List[Edge]:
         return self.adj.get(node_id, [])
@@ -129,6 +136,259 @@ def dijkstra_time_dependent(graph: Graph, start: str, goal: str, depart_time: da
     path.reverse()
     return dist[goal], path
 
+# -------------------------
+# ----- Alternative routes (plateau method, reliability-aware) ----
+# -------------------------
+def graph_from_osmnx(G, speed_kmh: float = 5.0,
+                     delay_fn_for: Optional[Callable[[object, object, dict], Optional[Callable[[datetime.datetime, int], int]]]] = None) -> Graph:
+    """
+    Convert an OSMnx (networkx Multi)DiGraph into a Graph so the same routing code works on real maps.
+    base_min is derived from the 'length' attribute (meters) at speed_kmh and kept as a float minute value.
+    delay_fn_for: optional function(u, v, edge_data) -> delay_fn (or None) to attach realtime delay providers.
+    """
+    g = Graph()
+    for n in G.nodes:
+        g.add_node(n)
+    for u, v, d in G.edges(data=True):
+        base = float(d.get("length", 0.0)) / 1000.0 / speed_kmh * 60.0
+        delay_fn = delay_fn_for(u, v, d) if delay_fn_for else None
+        g.add_edge(u, v, base_min=base, delay_fn=delay_fn,
+                   meta={"type": d.get("highway", "road"), "osmid": d.get("osmid")})
+    return g
+
+def _backward_tree(graph: Graph, goal: str) -> Tuple[Dict[str, float], Dict[str, int]]:
+    """
+    Backward Dijkstra over base_min only: (lower bound to goal, next edge index towards goal) per node.
+    Delays are never negative, so the bounds are an admissible A* heuristic for the forward tree,
+    nodes missing from them cannot reach the goal, and the next-edge pointers are the plateau method's backward tree.
+    It does not depend on the departure time, so it is cached on the graph and reused by later queries to the same goal.
+    """
+    if goal in graph.backward_trees:
+        return graph.backward_trees[goal]
+    rev: Dict[str, List[Tuple[str, int, float]]] = {}
+    for u, edges in graph.adj.items():
+        for idx, e in enumerate(edges):
+            rev.setdefault(e.to_node, []).append((u, idx, e.base_min))
+    h = {goal: 0}
+    nxt: Dict[str, int] = {}
+    pq = [(0, goal)]
+    while pq:
+        d, node = heapq.heappop(pq)
+        if d > h[node]:
+            continue
+        for u, idx, w in rev.get(node, []):
+            nd = d + w
+            if nd < h.get(u, float("inf")):
+                h[u] = nd
+                nxt[u] = idx
+                heapq.heappush(pq, (nd, u))
+    graph.backward_trees[goal] = (h, nxt)
+    return h, nxt
+
+def _forward_tree(graph: Graph, start: str, goal: str, depart_time: datetime.datetime,
+                  h: Dict[str, float], stretch: float) -> Tuple[Dict[str, float], Dict[str, Tuple[str, int]], float]:
+    """
+    Time-dependent A* from start that keeps growing after the goal is settled, until every node that could lie
+    on a route at most stretch times the optimum is labeled. Returns (elapsed, parent edge, optimum).
+    """
+    INF = float("inf")
+    dist = {start: 0}
+    prev: Dict[str, Tuple[str, int]] = {}
+    pq = [(h[start], 0, start)]
+    bound = INF
+    while pq:
+        f, elapsed_min, node = heapq.heappop(pq)
+        if f > bound:
+            break
+        if elapsed_min > dist[node]:
+            continue
+        if node == goal:
+            if bound == INF:
+                bound = stretch * elapsed_min
+            continue
+        for idx, edge in enumerate(graph.neighbors(node)):
+            v = edge.to_node
+            hv = h.get(v)
+            if hv is None:
+                continue
+            new_cost = elapsed_min + edge.effective_time(depart_time, elapsed_min)
+            if new_cost < dist.get(v, INF) and new_cost + hv <= bound:
+                dist[v] = new_cost
+                prev[v] = (node, idx)
+                heapq.heappush(pq, (new_cost + hv, new_cost, v))
+    return dist, prev, dist.get(goal, INF)
+
+def plateau_routes(graph: Graph, start: str, goal: str, depart_time: datetime.datetime, stretch: float = 1.25):
+    """
+    Alternative routes by the plateau method: one forward tree from start (time-dependent) and one backward
+    tree to goal (base times). A plateau is a chain of edges that both trees use; the route through it is
+    forward-tree path + backward-tree path, so every alternative is read off the same two trees.
+    Yields (travel_time_minutes, path_nodes, path_edges): the optimum first, then plateau routes
+    (loop-free, within stretch * optimum) from the best detour/plateau-length trade-off.
+    Path edges are (from_node, index into graph.adj[from_node]).
+    Only the backward-tree tail of a route is timed afresh (memoized, so each delay_fn is asked once per
+    (edge, elapsed)); its forward part is already timed by the forward tree's labels.
+    """
+    cache: Dict[Tuple[str, int, float], float] = {}
+    def edge_time(u: str, idx: int, elapsed_min: float) -> float:
+        key = (u, idx, elapsed_min)
+        if key not in cache:
+            cache[key] = graph.adj[u][idx].effective_time(depart_time, elapsed_min)
+        return cache[key]
+
+    h, nxt = _backward_tree(graph, goal)
+    if start not in h:
+        return
+    dist, prev, best = _forward_tree(graph, start, goal, depart_time, h, stretch)
+    if best == float("inf"):
+        return
+
+    def forward_edges(v):
+        edges = []
+        while v != start:
+            u, idx = prev[v]
+            edges.append((u, idx))
+            v = u
+        edges.reverse()
+        return edges
+
+    def on_plateau(u, idx):
+        return prev.get(graph.adj[u][idx].to_node) == (u, idx) and nxt.get(u) == idx
+
+    # plateau ends: nodes whose backward edge is not shared. A node not entered by a shared edge is a
+    # zero-length plateau (plain via node), so routes whose two halves never overlap are still offered.
+    plateaus = []
+    for b in prev:
+        if b == goal or b not in nxt or on_plateau(b, nxt[b]):
+            continue
+        length, a = 0.0, b
+        while a != start and nxt.get(prev[a][0]) == prev[a][1]:
+            a, i = prev[a]
+            length += graph.adj[a][i].base_min
+        detour = dist[b] + h[b]
+        if detour <= stretch * best:
+            plateaus.append((detour - length, b))
+    plateaus.sort()
+
+    main = forward_edges(goal)
+    yield best, [start] + [graph.adj[u][i].to_node for u, i in main], main
+    for _, b in plateaus:
+        edges = forward_edges(b)
+        elapsed = dist[b]
+        v = b
+        while v != goal and elapsed <= stretch * best:
+            edges.append((v, nxt[v]))
+            elapsed += edge_time(v, nxt[v], elapsed)
+            v = graph.adj[v][nxt[v]].to_node
+        nodes = [start] + [graph.adj[u][i].to_node for u, i in edges]
+        if v != goal or len(set(nodes)) != len(nodes) or edges == main:
+            continue
+        if elapsed <= stretch * best:
+            yield elapsed, nodes, edges
+
+def _delay_stats(e: Edge, depart_time: datetime.datetime, elapsed_min: int, samples: int) -> Tuple[float, float]:
+    """
+    (mean, variance) of one edge's effective time.
+    Providers may expose fn.stats(current_time, elapsed_min) -> (mean_delay, variance); otherwise fall back to sampling.
+    """
+    if not e.delay_fn:
+        return e.effective_time(depart_time, elapsed_min), 0.0
+    stats = getattr(e.delay_fn, "stats", None)
+    if stats is not None:
+        mean, var = stats(depart_time, elapsed_min)
+        return e.base_min + mean, var
+    if samples <= 1:
+        return e.effective_time(depart_time, elapsed_min), 0.0
+    draws = [e.effective_time(depart_time, elapsed_min) for _ in range(samples)]
+    mean = sum(draws) / samples
+    return mean, sum((x - mean) ** 2 for x in draws) / (samples - 1)
+
+def route_delay_stats(graph: Graph, path_edges: List[Tuple[str, int]], depart_time: datetime.datetime,
+                      samples: int = 20, cache: Optional[dict] = None) -> Tuple[float, float]:
+    """
+    Return (expected_minutes, variance) of a route from its edges' delay providers.
+    Edge delays are treated as independent, so per-edge variances add up.
+    cache: optional dict shared across routes, so an edge common to several alternatives is evaluated once.
+    """
+    cache = {} if cache is None else cache
+    expected = 0.0
+    variance = 0.0
+    for u, idx in path_edges:
+        key = (u, idx, int(expected))
+        if key not in cache:
+            cache[key] = _delay_stats(graph.adj[u][idx], depart_time, int(expected), samples)
+        mean, var = cache[key]
+        expected += mean
+        variance += var
+    return expected, variance
+
+def _route_overlap(graph: Graph, a: List[Tuple[str, int]], b: List[Tuple[str, int]]) -> float:
+    """Shared base time of two routes, as a fraction of the shorter one (0 = disjoint, 1 = same)."""
+    shared = set(a) & set(b)
+    if not shared:
+        return 0.0
+    def base(edges):
+        return sum(graph.adj[u][idx].base_min for u, idx in edges)
+    denom = min(base(a), base(b))
+    return 1.0 if denom <= 0 else base(shared) / denom
+
+def alternative_routes(graph: Graph, start: str, goal: str, depart_time: datetime.datetime, k: int = 3,
+                       max_overlap: float = 0.8, risk_weight: float = 1.0, samples: int = 20,
+                       stretch: float = 1.25) -> List[dict]:
+    """
+    Return up to k diverse routes ranked by expected time + risk_weight * standard deviation.
+    Candidates come from plateau_routes (at most stretch times the optimum); a candidate sharing more than
+    max_overlap of its base time with an already kept route is skipped. The list can be SHORTER than k
+    when the graph has fewer sufficiently different routes.
+    Each result: {"path", "edges", "travel_min", "expected_min", "variance", "std_min", "score"}
+    """
+    kept: List[dict] = []
+    stats_cache: dict = {}
+    for travel_min, nodes, edges in plateau_routes(graph, start, goal, depart_time, stretch):
+        if any(_route_overlap(graph, edges, r["edges"]) > max_overlap for r in kept):
+            continue
+        expected, variance = route_delay_stats(graph, edges, depart_time, samples, stats_cache)
+        std = math.sqrt(variance)
+        kept.append({"path": nodes, "edges": edges, "travel_min": travel_min,
+                     "expected_min": expected, "variance": variance, "std_min": std,
+                     "score": expected + risk_weight * std})
+        if len(kept) >= k:
+            break
+    kept.sort(key=lambda r: r["score"])
+    return kept
+
+def benchmark_alternatives(n: int = 60, k: int = 3, delayed_share: float = 0.1, seed: int = 0) -> dict:
+    """
+    Timing comparison on an n x n grid (delayed_share of edges use simulated_random_delay_provider):
+    alternative_routes(k) vs k independent dijkstra_time_dependent runs, corner to corner.
+    "cold" builds the backward tree; "warm" is a later query to the same goal (other departure time),
+    which reuses the tree cached on the graph and only grows the forward tree.
+    """
+    rnd = random.Random(seed)
+    g = Graph()
+    for i in range(n):
+        for j in range(n):
+            for di, dj in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                if 0 <= i + di < n and 0 <= j + dj < n:
+                    delay_fn = simulated_random_delay_provider(3, seed=rnd.random()) if rnd.random() < delayed_share else None
+                    g.add_edge(f"{i},{j}", f"{i + di},{j + dj}", base_min=rnd.randint(1, 4), delay_fn=delay_fn)
+    start, goal = "0,0", f"{n - 1},{n - 1}"
+    depart = datetime.datetime.combine(datetime.date.today(), datetime.time(8, 0))
+    t = time.perf_counter()
+    for _ in range(k):
+        dijkstra_time_dependent(g, start, goal, depart)
+    independent = time.perf_counter() - t
+    t = time.perf_counter()
+    routes = alternative_routes(g, start, goal, depart, k=k)
+    cold = time.perf_counter() - t
+    t = time.perf_counter()
+    alternative_routes(g, start, goal, depart + datetime.timedelta(minutes=10), k=k)
+    warm = time.perf_counter() - t
+    return {"k": k, "routes": len(routes), "independent_s": independent,
+            "alternatives_cold_s": cold, "alternatives_warm_s": warm,
+            "cold_ratio": cold / independent if independent else 0.0,
+            "warm_ratio": warm / independent if independent else 0.0}
+
 # -------------------------
 # ----- Simulated / API delay providers ----
 # -------------------------
@@ -143,6 +403,14 @@ def simulated_random_delay_provider(max_delay_min: int, seed=None):
         if 7 <= hour <= 9 or 17 <= hour <= 19:
             peak_multiplier = 1.5
         return int(base * peak_multiplier)
+    def stats(current_time: datetime.datetime, elapsed_min:int):
+        # exact (mean, variance) of the distribution above, without drawing from rnd
+        hour = current_time.hour
+        peak_multiplier = 1.5 if (7 <= hour <= 9 or 17 <= hour <= 19) else 1
+        values = [int(b * peak_multiplier) for b in range(max_delay_min + 1)]
+        mean = sum(values) / len(values)
+        return mean, sum((v - mean) ** 2 for v in values) / len(values)
+    fn.stats = stats
     return fn
 
 # Placeholder for a real bus API call (implementer: replace body with real requests)
@@ -163,6 +431,16 @@ def seoul_bus_arrival_delay_stub(stop_id: str):
         if 7 <= current_time.hour <= 9:
             d += 1
         return d + jitter
+    def stats(current_time: datetime.datetime, elapsed_min:int):
+        # jitter is uniform over {0, 1, 2}: mean 1, variance 2/3
+        try:
+            d = int(str(stop_id)[-1]) % 3
+        except Exception:
+            d = 0
+        if 7 <= current_time.hour <= 9:
+            d += 1
+        return d + 1, 2 / 3
+    fn.stats = stats
     return fn
 
 # -------------------------
@@ -171,14 +449,10 @@ def seoul_bus_arrival_delay_stub(stop_id: str):
 def top_k_departures(departure_list: List[Tuple[int, str]], k: int):
     """
     departure_list: list of (minutes_until_departure, "Bus 123 at Stop A")
-    Return top-k soonest departures using heap (min-heap).
+    Return top-k soonest departures using a bounded heap (O(n log k), no full copy).
+    For a live stop board use departures.DeparturesIndex instead of rebuilding this list.
     """
-    pq = departure_list[:]
-    heapq.heapify(pq)
-    topk = []
-    for _ in range(min(k, len(pq))):
-        topk.append(heapq.heappop(pq))
-    return topk
+    return heapq.nsmallest(k, departure_list)
 
 # -------------------------
 # ----- Streamlit UI ----
@@ -200,6 +474,8 @@ with st.sidebar:
     st.subheader("Graph / Edge options")
     use_sample_graph = st.checkbox("Use sample demo graph (recommended)", value=True)
     simulate_max_delay = st.slider("Simulate max extra delay per edge (minutes)", 0, 20, 5)
+    if st.button("Benchmark alternatives vs k× Dijkstra (60×60 grid)"):
+        st.write(benchmark_alternatives())
     st.markdown("---")
     st.subheader("API Keys & Hooks (옵션)")
     google_key = st.text_input("Google Directions API key (optional)", value="", help="실제 길찾이 연동 시 사용")
@@ -309,6 +585,14 @@ with col2:
             st.write(f"- {from_node} -> {to_node} | base {e.base_min} min | effective {eff} min | type={e.meta.get('type')}")
             elapsed += eff
 
+        # alternative routes ranked by expected time + delay spread
+        st.markdown("**Alternative routes (expected time ± std, reliability-ranked)**")
+        alts = alternative_routes(g, start=home, goal=destination, depart_time=last_leave, k=3)
+        for r in alts:
+            st.write(f"- {' → '.join(r['path'])} | expected {r['expected_min']:.1f} min ± {r['std_min']:.1f}")
+        if len(alts) < 3:
+            st.info(f"충분히 다른 경로가 {len(alts)}개뿐입니다 (요청 3개).")
+
         # demonstrate priority queue of upcoming departures (simulated)
         st.markdown("**Upcoming departures (simulated) — heap sort demo**")
         simulated_departures = []
@@ -324,10 +608,12 @@ with col2:
 
         # Provide suggestion rules
         st.markdown("**Smart rules**")
-        # simple heuristics: if any edge effective > base+threshold -> advance wake
+        # simple heuristics: if any edge on the chosen path has effective > base+threshold -> advance wake
         adv_minutes = 0
-        for from_node in g.adj:
-            for e in g.adj[from_node]:
+        for i in range(len(path)-1):
+            for e in g.neighbors(path[i]):
+                if e.to_node != path[i+1]:
+                    continue
                 # if bus/subway and large extra delay
                 base = e.base_min
                 eff = e.effective_time(last_leave, 0)
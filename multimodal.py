@@ -0,0 +1,307 @@
+# multimodal.py
+"""
+Multimodal graph: OSMnx walk network + bus stops / subway stations + transfer edges.
+ - MultimodalBuilder collects walk edges, stops (snapped to nearby walk nodes with transfer edges)
+   and transit legs from a timetable (or a headway taken from realtime arrivals)
+ - build() freezes everything into a compact CSR graph (flat `array` columns, one mode code per edge)
+ - MultimodalGraph.earliest_arrival() runs one time-dependent Dijkstra over all modes; its legs keep
+   the vehicle run (trip) they ride, so a change between two buses at one stop is its own leg
+Times are minutes since midnight.
+"""
+
+import bisect
+import heapq
+import math
+from array import array
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+WALK, TRANSFER, BUS, SUBWAY = 0, 1, 2, 3
+MODE_NAMES = {WALK: "walk", TRANSFER: "transfer", BUS: "bus", SUBWAY: "subway"}
+MODE_CODES = {v: k for k, v in MODE_NAMES.items()}
+
+
+def haversine_m(lat1, lon1, lat2, lon2) -> float:
+    R = 6371000.0
+    phi1 = math.radians(lat1); phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1); dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
+    return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+class MultimodalBuilder:
+    def __init__(self, walk_kmh: float = 5.0, cell_deg: float = 0.005):
+        """
+        walk_kmh: walking speed for walk and transfer edges
+        cell_deg: grid cell size (degrees) of the spatial hash used to snap stops to walk nodes
+        """
+        self.walk_kmh = walk_kmh
+        self.cell_deg = cell_deg
+        self.ids: List[Hashable] = []
+        self.index: Dict[Hashable, int] = {}
+        self.coords: List[Tuple[float, float]] = []
+        self.walk_nodes: List[int] = []
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        # static edges: (u, v, minutes, mode); timetabled edges: (u, v, mode) -> [(dep, arr, trip), ...]
+        self.static_edges: List[Tuple[int, int, float, int]] = []
+        self.timed_edges: Dict[Tuple[int, int, int], List[Tuple[float, float, int]]] = {}
+        self.trip_ids: List[Hashable] = []   # trip index -> caller's trip id
+
+    def _node(self, node_id: Hashable, lat: float, lon: float) -> int:
+        i = self.index.get(node_id)
+        if i is None:
+            i = len(self.ids)
+            self.index[node_id] = i
+            self.ids.append(node_id)
+            self.coords.append((lat, lon))
+        return i
+
+    def _walk_min(self, meters: float) -> float:
+        return meters / 1000.0 / self.walk_kmh * 60.0
+
+    def add_walk_graph(self, G):
+        """G: OSMnx graph (nodes carry 'x'/'y', edges carry 'length' in meters)."""
+        for n, d in G.nodes(data=True):
+            i = self._node(n, d["y"], d["x"])
+            self.walk_nodes.append(i)
+            cell = (int(d["y"] // self.cell_deg), int(d["x"] // self.cell_deg))
+            self._grid.setdefault(cell, []).append(i)
+        for u, v, d in G.edges(data=True):
+            self.static_edges.append((self.index[u], self.index[v], self._walk_min(float(d.get("length", 0.0))), WALK))
+
+    def nearest_walk_nodes(self, lat: float, lon: float, k: int = 2, radius_m: float = 400.0) -> List[Tuple[float, int]]:
+        """Up to k walk nodes within radius_m, as (meters, node index), nearest first."""
+        cy, cx = int(lat // self.cell_deg), int(lon // self.cell_deg)
+        # a longitude degree is cos(lat) times shorter than a latitude degree, so it needs more cells
+        reach_y = int(radius_m / (111000.0 * self.cell_deg)) + 1
+        reach_x = int(radius_m / (111000.0 * self.cell_deg * max(math.cos(math.radians(lat)), 1e-6))) + 1
+        found = []
+        for dy in range(-reach_y, reach_y + 1):
+            for dx in range(-reach_x, reach_x + 1):
+                for i in self._grid.get((cy + dy, cx + dx), ()):
+                    m = haversine_m(lat, lon, *self.coords[i])
+                    if m <= radius_m:
+                        found.append((m, i))
+        return heapq.nsmallest(k, found)
+
+    def add_stop(self, stop_id: Hashable, lat: float, lon: float, transfer_penalty_min: float = 1.0,
+                 k: int = 2, radius_m: float = 400.0) -> int:
+        """Add a stop/station and link it both ways to its k nearest walk nodes."""
+        s = self._node(stop_id, lat, lon)
+        for meters, w in self.nearest_walk_nodes(lat, lon, k, radius_m):
+            t = self._walk_min(meters)
+            self.static_edges.append((w, s, t + transfer_penalty_min, TRANSFER))
+            self.static_edges.append((s, w, t, TRANSFER))
+        return s
+
+    def add_trip(self, mode: str, stop_times: Sequence[Tuple[Hashable, float]],
+                 trip_id: Optional[Hashable] = None) -> int:
+        """
+        One vehicle run: [(stop_id, departure_minute), ...] in visiting order (from a timetable / GTFS stop_times).
+        Every consecutive pair becomes one connection on the (stop, next stop, mode) edge.
+        Returns the trip index (trip_id defaults to it).
+        """
+        code = MODE_CODES[mode]
+        trip = len(self.trip_ids)
+        self.trip_ids.append(trip if trip_id is None else trip_id)
+        for (a, dep), (b, arr) in zip(stop_times, stop_times[1:]):
+            key = (self.index[a], self.index[b], code)
+            self.timed_edges.setdefault(key, []).append((dep, arr, trip))
+        return trip
+
+    def add_headway_service(self, mode: str, stops: Sequence[Hashable], ride_min: Sequence[float],
+                            first_dep: float, headway_min: float, until: float = 24 * 60):
+        """Frequency-based line (e.g. realtime wait from api.get_bus_eta as first_dep, typical headway after)."""
+        if headway_min <= 0:
+            raise ValueError(f"headway_min must be positive, got {headway_min}")
+        if len(ride_min) != len(stops) - 1:
+            raise ValueError(f"need {len(stops) - 1} ride times for {len(stops)} stops, got {len(ride_min)}")
+        t = first_dep
+        while t <= until:
+            stop_times = [(stops[0], t)]
+            for s, r in zip(stops[1:], ride_min):
+                stop_times.append((s, stop_times[-1][1] + r))
+            self.add_trip(mode, stop_times)
+            t += headway_min
+
+    def build(self) -> "MultimodalGraph":
+        n = len(self.ids)
+        rows: List[Tuple[int, int, float, int, int]] = []   # (u, v, minutes, mode, timetable slot or -1)
+        tt_offsets = array("l", [0])
+        tt_dep = array("d")
+        tt_arr = array("d")
+        tt_use = array("l")    # connection that achieves tt_arr (absolute index)
+        tt_trip = array("l")   # trip index of each connection
+        for u, v, w, mode in self.static_edges:
+            rows.append((u, v, w, mode, -1))
+        for (u, v, mode), conns in self.timed_edges.items():
+            conns.sort()
+            # suffix minimum of arrivals: boarding at the first departure >= t also allows any later, faster run
+            lo = len(tt_dep)
+            best, best_j = math.inf, -1
+            arrs, uses = [], []
+            for j in range(len(conns) - 1, -1, -1):
+                if conns[j][1] < best:
+                    best, best_j = conns[j][1], lo + j
+                arrs.append(best)
+                uses.append(best_j)
+            arrs.reverse()
+            uses.reverse()
+            rows.append((u, v, 0.0, mode, len(tt_offsets) - 1))
+            tt_dep.extend(dep for dep, _, _ in conns)
+            tt_arr.extend(arrs)
+            tt_use.extend(uses)
+            tt_trip.extend(trip for _, _, trip in conns)
+            tt_offsets.append(len(tt_dep))
+        rows.sort(key=lambda r: r[0])
+
+        offsets = array("l", [0] * (n + 1))
+        for r in rows:
+            offsets[r[0] + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        return MultimodalGraph(
+            list(self.ids), offsets,
+            array("l", (r[1] for r in rows)), array("d", (r[2] for r in rows)),
+            array("b", (r[3] for r in rows)), array("l", (r[4] for r in rows)),
+            tt_offsets, tt_dep, tt_arr, tt_use, tt_trip, list(self.trip_ids))
+
+
+class MultimodalGraph:
+    """CSR adjacency; edge e of node u is in offsets[u]..offsets[u+1]."""
+    def __init__(self, ids, offsets, targets, minutes, modes, timetable, tt_offsets, tt_dep, tt_arr,
+                 tt_use, tt_trip, trip_ids):
+        self.ids = ids
+        self.index = {n: i for i, n in enumerate(ids)}
+        self.offsets = offsets
+        self.targets = targets
+        self.minutes = minutes
+        self.modes = modes
+        self.timetable = timetable
+        self.tt_offsets = tt_offsets
+        self.tt_dep = tt_dep
+        self.tt_arr = tt_arr
+        self.tt_use = tt_use
+        self.tt_trip = tt_trip
+        self.trip_ids = trip_ids
+        self._rev = None   # (rev_offsets, rev_sources, rev_edges), built on first backward query
+
+    def nbytes(self) -> int:
+        cols = (self.offsets, self.targets, self.minutes, self.modes, self.timetable,
+                self.tt_offsets, self.tt_dep, self.tt_arr, self.tt_use, self.tt_trip)
+        return sum(c.itemsize * len(c) for c in cols)
+
+    def _arrival(self, e: int, t: float) -> Tuple[float, int]:
+        """Earliest arrival at the head of edge e when at its tail by t, and the connection ridden (-1 if static)."""
+        slot = self.timetable[e]
+        if slot < 0:
+            return t + self.minutes[e], -1
+        lo, hi = self.tt_offsets[slot], self.tt_offsets[slot + 1]
+        j = bisect.bisect_left(self.tt_dep, t, lo, hi)
+        return (self.tt_arr[j], self.tt_use[j]) if j < hi else (math.inf, -1)
+
+    def _departure(self, e: int, t: float) -> float:
+        """Latest time to enter edge e and still be at its head by t."""
+        slot = self.timetable[e]
+        if slot < 0:
+            return t - self.minutes[e]
+        lo, hi = self.tt_offsets[slot], self.tt_offsets[slot + 1]
+        # tt_arr is a suffix minimum, so it is sorted and the last entry <= t is the latest usable run
+        j = bisect.bisect_right(self.tt_arr, t, lo, hi) - 1
+        return self.tt_dep[j] if j >= lo else -math.inf
+
+    def _reverse(self):
+        if self._rev is None:
+            n = len(self.ids)
+            sources = array("l", [0] * len(self.targets))
+            for u in range(n):
+                for e in range(self.offsets[u], self.offsets[u + 1]):
+                    sources[e] = u
+            order = sorted(range(len(self.targets)), key=lambda e: self.targets[e])
+            rev_offsets = array("l", [0] * (n + 1))
+            for e in order:
+                rev_offsets[self.targets[e] + 1] += 1
+            for i in range(n):
+                rev_offsets[i + 1] += rev_offsets[i]
+            self._rev = (rev_offsets, array("l", (sources[e] for e in order)), array("l", order))
+        return self._rev
+
+    def latest_departures(self, target: Hashable, arrive_by: float,
+                          max_travel_min: Optional[float] = None) -> Dict[int, float]:
+        """
+        One-to-many backward search: for every node that can reach target by arrive_by,
+        the latest minute one may leave it. Keys are node indices (see self.index).
+        """
+        rev_offsets, rev_sources, rev_edges = self._reverse()
+        dst = self.index[target]
+        limit = -math.inf if max_travel_min is None else arrive_by - max_travel_min
+        best = {dst: arrive_by}
+        pq = [(-arrive_by, dst)]
+        while pq:
+            neg_t, v = heapq.heappop(pq)
+            t = -neg_t
+            if t < best[v]:
+                continue
+            for i in range(rev_offsets[v], rev_offsets[v + 1]):
+                dep = self._departure(rev_edges[i], t)
+                u = rev_sources[i]
+                if dep >= limit and dep > best.get(u, -math.inf):
+                    best[u] = dep
+                    heapq.heappush(pq, (-dep, u))
+        return best
+
+    def earliest_arrival(self, source: Hashable, target: Hashable, depart_min: float,
+                         max_travel_min: Optional[float] = None,
+                         modes: Optional[Iterable[str]] = None
+                         ) -> Tuple[float, List[Tuple[Hashable, Hashable, str, float, float]]]:
+        """
+        Time-dependent Dijkstra from source leaving at depart_min.
+        max_travel_min bounds the search (and so per-query work); modes restricts usable transit modes.
+        Returns (arrival_minute, legs) with legs [(from_id, to_id, mode, board_min, alight_min), ...]:
+        consecutive walk/transfer edges form one walk leg, consecutive rides form one leg only while they
+        stay on the same trip (a change of bus at the same stop starts a new leg).
+        """
+        allowed = None
+        if modes is not None:
+            allowed = {MODE_CODES[m] for m in modes} | {WALK, TRANSFER}
+        src, dst = self.index[source], self.index[target]
+        limit = math.inf if max_travel_min is None else depart_min + max_travel_min
+        best = {src: depart_min}
+        prev: Dict[int, Tuple[int, int, int]] = {}   # node -> (previous node, edge used, connection or -1)
+        pq = [(depart_min, src)]
+        while pq:
+            t, u = heapq.heappop(pq)
+            if t > best[u]:
+                continue
+            if u == dst:
+                break
+            for e in range(self.offsets[u], self.offsets[u + 1]):
+                if allowed is not None and self.modes[e] not in allowed:
+                    continue
+                arr, conn = self._arrival(e, t)
+                v = self.targets[e]
+                if arr <= limit and arr < best.get(v, math.inf):
+                    best[v] = arr
+                    prev[v] = (u, e, conn)
+                    heapq.heappush(pq, (arr, v))
+
+        if dst not in best:
+            return math.inf, []
+        steps = []
+        cur = dst
+        while cur != src:
+            u, e, conn = prev[cur]
+            steps.append((u, cur, self.modes[e], conn))
+            cur = u
+        steps.reverse()
+        legs: List[Tuple[Hashable, Hashable, str, float, float]] = []
+        last_trip = None
+        for u, v, mode, conn in steps:
+            name = MODE_NAMES[mode if mode != TRANSFER else WALK]
+            trip = -1 if conn < 0 else self.tt_trip[conn]
+            if legs and legs[-1][2] == name and trip == last_trip:
+                legs[-1] = legs[-1][:1] + (self.ids[v], name, legs[-1][3], best[v])
+            else:
+                board = best[u] if conn < 0 else self.tt_dep[conn]
+                legs.append((self.ids[u], self.ids[v], name, board, best[v]))
+            last_trip = trip
+        return best[dst], legs
@@ -0,0 +1,356 @@
+# replay.py
+"""
+Record/replay transport for offline + load testing.
+ - record: real requests.get/post calls go out and every response is saved into a fixture directory
+ - replay: responses are served from the fixtures with configurable latency and injected errors
+ - live: plain pass-through
+`with session.patched():` swaps the module-level requests.get/post (what api.py and one.py call).
+Calls that do their own HTTP (geopy's Nominatim geocode, OSMnx graph downloads) go through
+session.call(name, fn, *args); see geocode_latlon / fetch_walk_graph.
+Run `python replay.py` for a load test of the whole wake-time pipeline
+(geocode -> Overpass -> bus ETA -> walk routing -> alarm) against synthetic fixtures.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import math
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+import api
+from alarm import calculate_alarm_time
+from multimodal import MultimodalBuilder, haversine_m
+
+RECORD = "record"
+REPLAY = "replay"
+LIVE = "live"
+
+
+class ReplayResponse:
+    """Minimal stand-in for requests.Response (what this project actually reads)."""
+    def __init__(self, status_code: int, text: str, headers: Optional[dict] = None, url: str = ""):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.headers = headers or {}
+        self.url = url
+        self.ok = status_code < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} for {self.url}", response=self)
+
+
+class FixtureStore:
+    """One JSON file per request, named by a hash of (method, url, params, data, json body)."""
+    def __init__(self, root: str = "fixtures"):
+        self.root = root
+        self._lock = threading.Lock()
+        self._cache: Dict[str, dict] = {}
+
+    @staticmethod
+    def key(method: str, url: str, params=None, data=None, json_body=None) -> str:
+        raw = json.dumps([method.upper(), url, params, data, json_body], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".json")
+
+    def load(self, key: str) -> Optional[dict]:
+        if key in self._cache:
+            return self._cache[key]
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            rec = json.load(f)
+        with self._lock:
+            self._cache[key] = rec
+        return rec
+
+    def save(self, key: str, rec: dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(rec, f, ensure_ascii=False)
+            self._cache[key] = rec
+
+
+class ReplaySession:
+    def __init__(self, store: FixtureStore, mode: str = REPLAY,
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, status_error_rate: float = 0.0,
+                 on_miss: str = "error", seed: Optional[int] = None):
+        """
+        latency_ms / jitter_ms: replayed responses sleep latency_ms + uniform(0, jitter_ms)
+        error_rate: probability of raising requests.ConnectionError instead of answering
+        status_error_rate: probability of answering HTTP 503
+        on_miss: in replay mode, "error" raises requests.ConnectionError, "live" records the real response
+        """
+        self.store = store
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.status_error_rate = status_error_rate
+        self.on_miss = on_miss
+        self._rnd = random.Random(seed)
+        self._rnd_lock = threading.Lock()
+        self._real_get = requests.get
+        self._real_post = requests.post
+
+    def _random(self) -> float:
+        with self._rnd_lock:
+            return self._rnd.random()
+
+    def _stand_in(self, url: str):
+        """Latency + error injection applied to every replayed answer."""
+        delay = self.latency_ms + self.jitter_ms * self._random()
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        if self.error_rate and self._random() < self.error_rate:
+            raise requests.ConnectionError(f"injected connection error: {url}")
+        if self.status_error_rate and self._random() < self.status_error_rate:
+            return ReplayResponse(503, "", url=url)
+        return None
+
+    def _real(self, method: str, url: str, params=None, data=None, **kwargs):
+        if method == "GET":
+            return self._real_get(url, params=params, **kwargs)
+        return self._real_post(url, data=data, params=params, **kwargs)
+
+    def request(self, method: str, url: str, params=None, data=None, **kwargs):
+        if self.mode == LIVE:
+            return self._real(method, url, params, data, **kwargs)
+
+        key = FixtureStore.key(method, url, params, data, kwargs.get("json"))
+        rec = self.store.load(key) if self.mode == REPLAY else None
+        if rec is None:
+            if self.mode == REPLAY and self.on_miss != "live":
+                raise requests.ConnectionError(f"no fixture for {method} {url}")
+            r = self._real(method, url, params, data, **kwargs)
+            self.store.save(key, {"method": method, "url": url, "params": params, "data": data,
+                                  "json": kwargs.get("json"), "status_code": r.status_code, "text": r.text,
+                                  "headers": dict(r.headers)})
+            return r
+
+        injected = self._stand_in(url)
+        if injected is not None:
+            return injected
+        return ReplayResponse(rec["status_code"], rec["text"], rec.get("headers"), url=url)
+
+    def get(self, url, params=None, **kwargs):
+        return self.request("GET", url, params=params, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        return self.request("POST", url, params=kwargs.pop("params", None), data=data, **kwargs)
+
+    def call(self, name: str, fn: Callable, *args):
+        """
+        Record/replay any JSON-serializable call, e.g. a geocode wrapped to return (lat, lon):
+        session.call("geocode", geocode_latlon, "서울역")
+        """
+        key = FixtureStore.key("CALL", name, list(args))
+        if self.mode == LIVE:
+            return fn(*args)
+        rec = self.store.load(key) if self.mode == REPLAY else None
+        if rec is None:
+            if self.mode == REPLAY and self.on_miss != "live":
+                raise KeyError(f"no fixture for {name}{args}")
+            value = fn(*args)
+            self.store.save(key, {"call": name, "args": list(args), "value": value})
+            return value
+        if self._stand_in(name) is not None:
+            raise requests.ConnectionError(f"injected error: {name}")
+        return rec["value"]
+
+    @contextlib.contextmanager
+    def patched(self):
+        """Route module-level requests.get/post through this session."""
+        requests.get, requests.post = self.get, self.post
+        try:
+            yield self
+        finally:
+            requests.get, requests.post = self._real_get, self._real_post
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, int(round(p / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[i]
+
+
+def load_test(fn: Callable[[int], object], n: int = 1000, workers: int = 8) -> dict:
+    """Call fn(i) n times on a thread pool; report throughput, error count and latency percentiles (ms)."""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        t = time.perf_counter()
+        try:
+            fn(i)
+            ok = True
+        except Exception:
+            ok = False
+        dt = (time.perf_counter() - t) * 1000.0
+        with lock:
+            latencies.append(dt)
+            if not ok:
+                errors += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(one, range(n)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    return {"calls": n, "errors": errors, "throughput_per_s": n / wall if wall else 0.0,
+            "p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99), "max_ms": latencies[-1] if latencies else 0.0}
+
+
+# -------------------------
+# whole wake-time pipeline, every external dependency recordable
+# -------------------------
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+BUS_ARRIVAL_URL = "https://apis.data.go.kr/6410000/busarrivalservice/v2/arrivalsByRoute"
+
+
+def geocode_latlon(query: str):
+    """Nominatim geocode as [lat, lon] (JSON-friendly, for session.call)."""
+    from geopy.geocoders import Nominatim
+    g = Nominatim(user_agent="smart_commute_app").geocode(query, timeout=10)
+    return [g.latitude, g.longitude] if g else None
+
+
+def fetch_walk_graph(lat: float, lon: float, dist: int):
+    """OSMnx walk graph around (lat, lon) as {"nodes": [[id, y, x]], "edges": [[u, v, length]]}."""
+    import osmnx as ox
+    G = ox.graph_from_point((lat, lon), dist=dist, network_type="walk")
+    return {"nodes": [[n, d["y"], d["x"]] for n, d in G.nodes(data=True)],
+            "edges": [[u, v, float(d.get("length", 0.0))] for u, v, d in G.edges(data=True)]}
+
+
+class _ListGraph:
+    """Duck-typed stand-in for an OSMnx graph built from fetch_walk_graph output."""
+    def __init__(self, data: dict):
+        self._nodes = [(n, {"y": y, "x": x}) for n, y, x in data["nodes"]]
+        self._edges = [(u, v, {"length": length}) for u, v, length in data["edges"]]
+
+    def nodes(self, data=False):
+        return self._nodes
+
+    def edges(self, data=False):
+        return self._edges
+
+
+def wake_time_pipeline(session: ReplaySession, start_addr: str, end_addr: str, route_id: str,
+                       prep_time: int = 40, school_hour: int = 9, school_minute: int = 0,
+                       geocode: Callable = geocode_latlon, walk_graph: Callable = fetch_walk_graph) -> str:
+    """
+    Address -> alarm time, like one.py's bus mode, but every failure propagates (nothing falls back),
+    so load_test counts injected errors. Run inside session.patched().
+    """
+    start = session.call("geocode", geocode, start_addr)
+    end = session.call("geocode", geocode, end_addr)
+    if not start or not end:
+        raise LookupError("geocode failed")
+
+    # nearest bus stop (same Overpass query shape as one.py)
+    query = f'[out:json][timeout:25];(node["highway"="bus_stop"](around:500,{start[0]},{start[1]}););out body;'
+    r = requests.post(OVERPASS_URL, data={"data": query}, timeout=20)
+    r.raise_for_status()
+    stops = [el for el in r.json().get("elements", []) if el.get("type") == "node"]
+    if not stops:
+        raise LookupError("no bus stop near start")
+    stop = min(stops, key=lambda el: haversine_m(start[0], start[1], el["lat"], el["lon"]))
+
+    # realtime wait at that stop
+    station_id = stop.get("tags", {}).get("ref", stop["id"])
+    r = requests.get(f"{BUS_ARRIVAL_URL}?serviceKey={api.BUS_API_KEY}&busRouteId={route_id}&stationId={station_id}", timeout=6)
+    r.raise_for_status()
+    arrivals = r.json().get("response", {}).get("busArrivalList", [])
+    if not arrivals:
+        raise LookupError("no bus arrivals")
+    wait_min = int(arrivals[0]["predictTime1"])
+
+    # walk start -> stop on the OSM walk network
+    b = MultimodalBuilder()
+    b.add_walk_graph(_ListGraph(session.call("walk_graph", walk_graph, start[0], start[1], 1000)))
+    b.add_stop("STOP", stop["lat"], stop["lon"])
+    origin = b.nearest_walk_nodes(start[0], start[1], k=1)
+    if not origin:
+        raise LookupError("start not on walk network")
+    g = b.build()
+    walk_min, _ = g.earliest_arrival(b.ids[origin[0][1]], "STOP", 0)
+    if math.isinf(walk_min):
+        raise LookupError("bus stop unreachable on foot")
+
+    ride_min = haversine_m(stop["lat"], stop["lon"], end[0], end[1]) / 1000.0 / 30 * 60   # bus ~30 km/h as in one.py
+    return calculate_alarm_time(prep_time, math.ceil(walk_min + wait_min + ride_min), school_hour, school_minute)
+
+
+def _record_synthetic_fixtures(store: FixtureStore, n_addresses: int = 20) -> List[str]:
+    """Fill store through RECORD mode against a local fake backend (stands in for capturing real responses once)."""
+    rnd = random.Random(0)
+    base_lat, base_lon = 37.55, 126.97
+    places = {f"주소{i}": [base_lat + rnd.uniform(0, 0.004), base_lon + rnd.uniform(0, 0.004)] for i in range(n_addresses)}
+    places["학교"] = [base_lat + 0.03, base_lon + 0.03]
+
+    def fake_get(url, params=None, **kwargs):
+        body = {"response": {"busArrivalList": [{"predictTime1": 2 + len(url) % 9}]}}
+        return ReplayResponse(200, json.dumps(body), url=url)
+
+    def fake_post(url, data=None, params=None, **kwargs):
+        lat, lon = [float(v) for v in data["data"].split("around:500,")[1].split(")")[0].split(",")]
+        body = {"elements": [{"type": "node", "id": 1000 + k, "lat": lat + 0.001 * k, "lon": lon + 0.001,
+                              "tags": {"name": f"정류장{k}"}} for k in range(3)]}
+        return ReplayResponse(200, json.dumps(body), url=url)
+
+    def fake_walk_graph(lat, lon, dist):
+        n, step = 30, 0.0005
+        cell = lambda i, j: i * n + j
+        nodes = [[cell(i, j), lat - 0.005 + i * step, lon - 0.005 + j * step] for i in range(n) for j in range(n)]
+        edges = []
+        for i in range(n):
+            for j in range(n):
+                for di, dj in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                    if 0 <= i + di < n and 0 <= j + dj < n:
+                        edges.append([cell(i, j), cell(i + di, j + dj), 50.0])
+        return {"nodes": nodes, "edges": edges}
+
+    rec = ReplaySession(store, RECORD)
+    rec._real_get, rec._real_post = fake_get, fake_post
+    addresses = [a for a in places if a != "학교"]
+    with rec.patched():
+        for addr in addresses:
+            wake_time_pipeline(rec, addr, "학교", "R1", geocode=places.get, walk_graph=fake_walk_graph)
+    return addresses
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    store = FixtureStore(tempfile.mkdtemp(prefix="fixtures_"))
+    addresses = _record_synthetic_fixtures(store)
+    session = ReplaySession(store, REPLAY, latency_ms=20, jitter_ms=80,
+                            error_rate=0.01, status_error_rate=0.01, seed=0)
+
+    def pipeline(i):
+        return wake_time_pipeline(session, addresses[i % len(addresses)], "학교", "R1")
+
+    with session.patched():
+        print(load_test(pipeline, n=2000, workers=32))
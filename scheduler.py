@@ -0,0 +1,260 @@
+# scheduler.py
+"""
+Alarm scheduler service for many users.
+ - All pending wake/leave times live in one min-heap (lazy deletion + version numbers), so add/update/remove are O(log n)
+ - Each alarm lists the route keys it depends on (edge/stop/station ids); a delay update re-evaluates only
+   the alarms indexed under the keys that actually changed
+ - Due alarms are pushed to a pluggable sink: any callable(event: str, alarm: Alarm)
+ - serve() is the blocking service loop: it sleeps until the next alarm or delay poll, whichever is first,
+   and wakes early when alarms are added/rescheduled from other threads; stop() ends it
+"""
+
+import datetime
+import heapq
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+WAKE = "wake"
+LEAVE = "leave"
+
+
+class Alarm:
+    def __init__(self, user_id: str, arrival_dt: datetime.datetime, prep_min: float,
+                 base_travel_min: float, route_keys: Iterable[str] = (), buffer_min: float = 0):
+        """
+        arrival_dt: when the user must be at school
+        prep_min: wake -> leave (shower, breakfast, ...)
+        base_travel_min: travel time without realtime delays
+        route_keys: ids whose realtime delay (minutes) is added to the travel time
+        buffer_min: spare minutes before arrival_dt
+        """
+        self.user_id = user_id
+        self.arrival_dt = arrival_dt
+        self.prep_min = prep_min
+        self.base_travel_min = base_travel_min
+        self.route_keys = tuple(route_keys)
+        self.buffer_min = buffer_min
+        self.delay_min = 0.0
+        self.stage = WAKE
+        self.version = 0   # set by AlarmScheduler; identifies this alarm's live heap entry
+
+    @property
+    def travel_min(self) -> float:
+        return self.base_travel_min + self.delay_min
+
+    @property
+    def leave_dt(self) -> datetime.datetime:
+        return self.arrival_dt - datetime.timedelta(minutes=self.travel_min + self.buffer_min)
+
+    @property
+    def wake_dt(self) -> datetime.datetime:
+        return self.leave_dt - datetime.timedelta(minutes=self.prep_min)
+
+    def next_fire(self) -> datetime.datetime:
+        return self.wake_dt if self.stage == WAKE else self.leave_dt
+
+
+def print_sink(event: str, alarm: Alarm):
+    """Default local sink: print to stdout."""
+    print(f"[{event}] {alarm.user_id} wake {alarm.wake_dt.strftime('%H:%M')} "
+          f"leave {alarm.leave_dt.strftime('%H:%M')} (travel {round(alarm.travel_min, 1)} min)")
+
+
+class ListSink:
+    """Collects fired alarms in memory (handy for tests / batch runs)."""
+    def __init__(self):
+        self.events: List[Tuple[str, Alarm]] = []
+
+    def __call__(self, event: str, alarm: Alarm):
+        self.events.append((event, alarm))
+
+
+class AlarmScheduler:
+    def __init__(self, sink: Optional[Callable[[str, Alarm], None]] = None):
+        self.sink = sink or print_sink
+        self.alarms: Dict[str, Alarm] = {}
+        self.delays: Dict[str, float] = {}            # route key -> current delay (minutes)
+        self.by_key: Dict[str, Set[str]] = {}         # route key -> user ids depending on it
+        # heap of (fire_time, seq, user_id, version); entries with an old version are stale
+        self._heap: List[Tuple[datetime.datetime, int, str, int]] = []
+        self._seq = 0
+        # one counter for all alarms, so a replacement Alarm never reuses a version of the one it replaced
+        self._version = 0
+        self._lock = threading.RLock()
+        self._changed = threading.Event()   # wakes serve() when the earliest fire time may have moved
+        self._stopping = threading.Event()
+
+    def __len__(self):
+        return len(self.alarms)
+
+    def _push(self, alarm: Alarm):
+        self._version += 1
+        alarm.version = self._version
+        self._seq += 1
+        heapq.heappush(self._heap, (alarm.next_fire(), self._seq, alarm.user_id, alarm.version))
+        # drop stale entries once they dominate the heap, so memory stays O(live alarms)
+        if len(self._heap) > 2 * len(self.alarms) + 64:
+            self._heap = [e for e in self._heap
+                          if e[2] in self.alarms and self.alarms[e[2]].version == e[3]]
+            heapq.heapify(self._heap)
+
+    def add_alarm(self, alarm: Alarm):
+        """Add or replace the alarm of alarm.user_id."""
+        with self._lock:
+            if alarm.user_id in self.alarms:
+                self.remove_alarm(alarm.user_id)
+            alarm.delay_min = sum(self.delays.get(k, 0) for k in alarm.route_keys)
+            self.alarms[alarm.user_id] = alarm
+            for k in alarm.route_keys:
+                self.by_key.setdefault(k, set()).add(alarm.user_id)
+            self._push(alarm)
+        self._changed.set()
+
+    def remove_alarm(self, user_id: str) -> Optional[Alarm]:
+        with self._lock:
+            alarm = self.alarms.pop(user_id, None)
+            if alarm is None:
+                return None
+            for k in alarm.route_keys:
+                users = self.by_key.get(k)
+                if users is not None:
+                    users.discard(user_id)
+                    if not users:
+                        del self.by_key[k]
+            # its heap entries become stale: the user id is gone, or now maps to an alarm with a newer version
+            alarm.version = 0
+            return alarm
+
+    def update_delays(self, delays: Dict[str, float]) -> int:
+        """
+        delays: route key -> new realtime delay (minutes)
+        Only alarms depending on a key whose value changed are re-evaluated.
+        Returns the number of alarms rescheduled.
+        """
+        with self._lock:
+            touched: Dict[str, float] = {}
+            for k, new in delays.items():
+                diff = new - self.delays.get(k, 0)
+                if diff == 0:
+                    continue
+                self.delays[k] = new
+                for user_id in self.by_key.get(k, ()):
+                    touched[user_id] = touched.get(user_id, 0) + diff
+            for user_id, diff in touched.items():
+                alarm = self.alarms[user_id]
+                alarm.delay_min += diff
+                self._push(alarm)
+        if touched:
+            self._changed.set()
+        return len(touched)
+
+    def next_due(self) -> Optional[datetime.datetime]:
+        """Earliest pending fire time, or None."""
+        with self._lock:
+            while self._heap:
+                fire, _, user_id, version = self._heap[0]
+                alarm = self.alarms.get(user_id)
+                if alarm is not None and alarm.version == version:
+                    return fire
+                heapq.heappop(self._heap)
+            return None
+
+    def run_due(self, now: Optional[datetime.datetime] = None) -> int:
+        """Emit every alarm whose wake/leave time is <= now. Returns the number of events emitted."""
+        with self._lock:
+            now = now or datetime.datetime.now()
+            fired = 0
+            while True:
+                fire = self.next_due()
+                if fire is None or fire > now:
+                    break
+                _, _, user_id, _ = heapq.heappop(self._heap)
+                alarm = self.alarms[user_id]
+                self.sink(alarm.stage, alarm)
+                fired += 1
+                if alarm.stage == WAKE:
+                    alarm.stage = LEAVE
+                    self._push(alarm)
+                else:
+                    self.remove_alarm(user_id)
+            return fired
+
+    def serve(self, poll_delays: Optional[Callable[[], Optional[Dict[str, float]]]] = None,
+              poll_interval_s: float = 30.0, max_sleep_s: float = 60.0,
+              clock: Callable[[], datetime.datetime] = datetime.datetime.now):
+        """
+        Blocking service loop; returns after stop().
+        poll_delays: called every poll_interval_s, returns route key -> delay (or None) for update_delays
+        max_sleep_s: upper bound on one sleep, so a changed wall clock is noticed
+        """
+        self._stopping.clear()
+        next_poll = clock()
+        while not self._stopping.is_set():
+            now = clock()
+            if poll_delays is not None and now >= next_poll:
+                try:
+                    delays = poll_delays()
+                except Exception as e:
+                    # a failed poll keeps the last known delays
+                    print(f"delay poll failed: {e}")
+                    delays = None
+                if delays:
+                    self.update_delays(delays)
+                next_poll = now + datetime.timedelta(seconds=poll_interval_s)
+            self._changed.clear()
+            self.run_due(now)
+
+            wake = self.next_due()
+            if poll_delays is not None:
+                wake = next_poll if wake is None else min(wake, next_poll)
+            timeout = max_sleep_s if wake is None else (wake - clock()).total_seconds()
+            self._changed.wait(min(max(timeout, 0.0), max_sleep_s))
+
+    def stop(self):
+        """Make serve() return (safe to call from another thread or from a sink)."""
+        self._stopping.set()
+        self._changed.set()
+
+
+def _self_check():
+    """Regression checks: replacing or removing + re-adding an alarm must not fire the old heap entry."""
+    base = datetime.datetime(2025, 1, 1, 9, 0)
+    sink = ListSink()
+    sch = AlarmScheduler(sink=sink)
+    # wake 08:00, then replaced by wake 08:40
+    sch.add_alarm(Alarm("u1", base, prep_min=30, base_travel_min=30))
+    sch.add_alarm(Alarm("u1", base, prep_min=10, base_travel_min=10))
+    assert sch.run_due(datetime.datetime(2025, 1, 1, 8, 5)) == 0, sink.events
+    assert sch.next_due() == datetime.datetime(2025, 1, 1, 8, 40)
+
+    sch.remove_alarm("u1")
+    assert sch.next_due() is None
+    sch.add_alarm(Alarm("u1", base, prep_min=30, base_travel_min=30))
+    sch.remove_alarm("u1")
+    sch.add_alarm(Alarm("u1", base, prep_min=10, base_travel_min=10))
+    assert sch.run_due(datetime.datetime(2025, 1, 1, 8, 5)) == 0, sink.events
+    assert sch.run_due(datetime.datetime(2025, 1, 1, 8, 45)) == 1
+    assert [e for e, _ in sink.events] == [WAKE]
+
+    # serve(): fires on its own, picks up alarms added while sleeping and delay polls, stops on request
+    sink = ListSink()
+    sch = AlarmScheduler(sink=sink)
+    soon = datetime.datetime.now() + datetime.timedelta(seconds=0.2)
+    polls = []
+    def poll():
+        polls.append(1)
+        return {"bus-1": 0}
+    worker = threading.Thread(target=sch.serve, kwargs={"poll_delays": poll, "poll_interval_s": 0.1})
+    worker.start()
+    sch.add_alarm(Alarm("u2", soon, prep_min=0, base_travel_min=0, route_keys=["bus-1"]))
+    worker.join(1.0)
+    sch.stop()
+    worker.join(1.0)
+    assert not worker.is_alive()
+    assert [(e, a.user_id) for e, a in sink.events] == [(WAKE, "u2"), (LEAVE, "u2")], sink.events
+    assert len(polls) >= 2
+    print("scheduler self-check ok")
+
+
+if __name__ == "__main__":
+    _self_check()